@@ -8,40 +8,95 @@ Contributions from that person should count towards all companies they're an exe
 """
 
 import os
-import pymysql
+import re
+import platform
+import subprocess
 import pandas as pd
-from sshtunnel import SSHTunnelForwarder
 from firebase_admin import credentials, initialize_app, db
 import firebase_admin
 from dotenv import load_dotenv
 from datetime import datetime
-import json
+import orjson
 from typing import Dict, Any, Optional, List, Tuple
 from rapidfuzz import fuzz, process
-from collections import defaultdict
+from collections import defaultdict, Counter
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+import jellyfish
+import numpy as np
 
 # Load environment variables
 load_dotenv()
 
+# Command that opens a file in its default application (None on other platforms)
+FILE_OPENER = {
+    'Darwin': ['open'],
+    'Windows': ['cmd', '/c', 'start', ''],
+    'Linux': ['xdg-open'],
+}.get(platform.system())
+
+# Rows fetched per round-trip when streaming the executives table
+FETCH_CHUNK_SIZE = 50_000
+
+# Blocks at least this big are scored one at a time with all of rapidfuzz's
+# worker threads instead of alongside other blocks on the thread pool
+LARGE_BLOCK_SIZE = 1_000
+
+# Score cells computed per cdist call when scoring a block; big blocks are split
+# into row slices of this many cells (about 20 MB per float32 matrix)
+SCORE_SLICE_CELLS = 5_000_000
+
+# Paths written per multi-path Firebase update (keeps each request well under the payload limit)
+FIREBASE_BATCH_SIZE = 500
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Characters Firebase doesn't allow in a key ('.' is already stripped from keys)
+INVALID_KEY_RE = re.compile(r'[/#$\[\]]')
+
+# Combining accents left behind by NFKD ("José" -> "Jose" + U+0301)
+COMBINING_MARK_RE = re.compile('[\u0300-\u036f]')
+
+# Generational suffixes ignored when picking the last name for blocking
+NAME_SUFFIXES = {'jr', 'sr', 'ii', 'iii', 'iv'}
+
+COLUMN_TOKEN_RE = re.compile(r'[a-z]+')
+
+# Common variations of column names, in (name, title, address, company) order
+COLUMN_VARIATIONS = (
+    ['name', 'executive_name', 'person_name', 'full_name',
+     'first_name', 'last_name', 'exec_name'],
+    ['title', 'job_title', 'position', 'role', 'job', 'exec_title'],
+    ['address', 'location', 'city', 'state', 'address_line',
+     'street', 'mailing_address'],
+    ['company', 'company_name', 'employer', 'firm',
+     'organization', 'org'],
+)
+
+@lru_cache(maxsize=None)
+def get_firebase_credential():
+    """Build the service account credential from env vars (once per process)"""
+    private_key = os.getenv('FIREBASE_PRIVATE_KEY')
+    if not private_key:
+        raise ValueError("FIREBASE_PRIVATE_KEY environment variable is not set")
+    
+    cred_info = {
+        "type": "service_account",
+        "project_id": os.getenv('FIREBASE_PROJECT_ID'),
+        "private_key_id": os.getenv('FIREBASE_PRIVATE_KEY_ID'),
+        "private_key": private_key.replace('\\n', '\n'),
+        "client_email": os.getenv('FIREBASE_CLIENT_EMAIL'),
+        "client_id": os.getenv('FIREBASE_CLIENT_ID'),
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://accounts.google.com/o/oauth2/token"
+    }
+    return credentials.Certificate(cred_info)
+
 def setup_firebase_realtime():
     """Connect to Firebase Realtime Database"""
     try:
         if not firebase_admin._apps:
-            private_key = os.getenv('FIREBASE_PRIVATE_KEY')
-            if not private_key:
-                raise ValueError("FIREBASE_PRIVATE_KEY environment variable is not set")
-            
-            cred_info = {
-                "type": "service_account",
-                "project_id": os.getenv('FIREBASE_PROJECT_ID'),
-                "private_key_id": os.getenv('FIREBASE_PRIVATE_KEY_ID'),
-                "private_key": private_key.replace('\\n', '\n'),
-                "client_email": os.getenv('FIREBASE_CLIENT_EMAIL'),
-                "client_id": os.getenv('FIREBASE_CLIENT_ID'),
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://accounts.google.com/o/oauth2/token"
-            }
-            cred = credentials.Certificate(cred_info)
+            cred = get_firebase_credential()
             initialize_app(cred, {
                 'databaseURL': f"https://{os.getenv('FIREBASE_PROJECT_ID')}-default-rtdb.firebaseio.com/"
             })
@@ -56,6 +111,10 @@ def setup_firebase_realtime():
 
 def connect_to_index_align_db():
     """Connect to Index Align database via SSH tunnel"""
+    # Imported here so the review tool starts quickly when no DB work is needed
+    import pymysql
+    from sshtunnel import SSHTunnelForwarder
+    
     try:
         ssh_host = os.getenv('INDEX_ALIGN_SSH_HOST')
         ssh_user = os.getenv('INDEX_ALIGN_SSH_USER')
@@ -139,6 +198,8 @@ def get_executive_table_structure(conn):
 
 def get_executives_from_database(conn, table_name='executives'):
     """Retrieve executive records from Index Align database"""
+    from pymysql.cursors import SSCursor
+    
     try:
         # First, get table structure
         table_name, columns = get_executive_table_structure(conn)
@@ -146,12 +207,33 @@ def get_executives_from_database(conn, table_name='executives'):
             print("ERROR: Could not find executives table")
             return None
         
-        # Query all executives
-        query = f"SELECT * FROM {table_name}"
+        # Query all executives. The review export shows every field, so all
+        # columns are kept, but they are listed explicitly rather than SELECT *
+        column_list = ', '.join(f"`{col}`" for col in columns)
+        query = f"SELECT {column_list} FROM {table_name}"
         
-        df = pd.read_sql(query, conn)
+        # Stream rows with an unbuffered cursor and build the DataFrame in
+        # chunks, so the full result set is never held as a list of dicts
+        chunks = []
+        with conn.cursor(SSCursor) as cursor:
+            cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(FETCH_CHUNK_SIZE)
+                if not rows:
+                    break
+                chunks.append(pd.DataFrame.from_records(rows, columns=columns, coerce_float=True))
+        
+        if chunks:
+            df = pd.concat(chunks, ignore_index=True)
+        else:
+            df = pd.DataFrame(columns=columns)
         print(f"SUCCESS: Retrieved {len(df)} executive records from Index Align database")
         
+        # Low-cardinality text columns take far less memory as categoricals
+        _, title_col, _, company_col = identify_column_names(df)
+        for col in {title_col, company_col} - {None}:
+            df[col] = df[col].astype('category')
+        
         # Display sample data
         if len(df) > 0:
             print("\nSample executive data:")
@@ -165,18 +247,42 @@ def get_executives_from_database(conn, table_name='executives'):
         traceback.print_exc()
         return None
 
+def is_missing(value) -> bool:
+    """Check for a NULL cell (None or NaN) without going through pd.isna"""
+    return value is None or (isinstance(value, float) and value != value)
+
+@lru_cache(maxsize=100_000)
 def normalize_string(s):
     """Normalize string for comparison"""
-    if pd.isna(s) or s is None:
+    if is_missing(s):
         return ""
-    s = str(s).strip().lower()
-    # Remove common punctuation and extra spaces
-    s = ' '.join(s.split())
-    return s
+    # Collapse runs of whitespace into single spaces
+    return WHITESPACE_RE.sub(' ', str(s).strip().lower())
+
+def normalize_column(series: pd.Series, fold_accents: bool = False) -> List[str]:
+    """
+    Normalize a whole column at once (same result as normalize_string on each cell).
+    With fold_accents, NFKD-decompose and drop accents and width variants
+    first, so "José Álvarez" compares equal to "Jose Alvarez".
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # Normalize each distinct value once and expand through the codes (-1 = NULL)
+        categories = normalize_column(series.cat.categories.to_series(), fold_accents)
+        lookup = np.array(categories + [""], dtype=object)
+        return lookup[series.cat.codes.to_numpy()].tolist()
+    normalized = series.astype('string')
+    if fold_accents:
+        normalized = (normalized.str.normalize('NFKD')
+                      .str.replace(COMBINING_MARK_RE, '', regex=True))
+    normalized = (normalized
+                  .str.strip()
+                  .str.lower()
+                  .str.replace(WHITESPACE_RE, ' ', regex=True))
+    return normalized.fillna("").tolist()
 
 def extract_name_parts(name):
     """Extract first and last name parts"""
-    if not name or pd.isna(name):
+    if not name or is_missing(name):
         return "", ""
     name = str(name).strip()
     parts = name.split()
@@ -186,10 +292,44 @@ def extract_name_parts(name):
         return parts[0].lower(), ""
     return "", ""
 
-def calculate_similarity_score(record1: Dict, record2: Dict, name_col: str, 
-                                title_col: str, address_col: str, company_col: str) -> float:
+def get_block_keys(name) -> List[str]:
+    """
+    Get the blocking key for a name: the phonetic code of the last name, or the
+    last name itself when it has no phonetic code. Every record with the same
+    last name has the same code, so a separate last-name block would only be a
+    subset of the phonetic one and score its pairs twice.
+    """
+    if not name or is_missing(name):
+        return []
+    # Only look before the first comma so "Smith, John" and "John Smith, Jr." both give "smith"
+    tokens = [t.strip('.') for t in str(name).lower().split(',')[0].split()]
+    tokens = [t for t in tokens if t and t not in NAME_SUFFIXES]
+    if not tokens:
+        return []
+    last_name = tokens[-1]
+    phonetic = jellyfish.metaphone(last_name)
+    if phonetic:
+        return [f"phonetic:{phonetic}"]
+    return [f"last:{last_name}"]
+
+def build_blocks(names: List[str]) -> Dict[str, List[int]]:
+    """
+    Bucket record indices by the metaphone code of the last name.
+    Only records sharing a block are compared, so spelling variants like
+    "Smith" / "Smyth" still meet while unrelated names are never scored.
     """
-    Calculate similarity score between two executive records.
+    blocks = defaultdict(list)
+    for idx, name in enumerate(names):
+        for key in get_block_keys(name):
+            blocks[key].append(idx)
+    return blocks
+
+def calculate_similarity_score(i: int, j: int, names: List[str], titles: List[str],
+                               addresses: List[str], companies: List[str]) -> float:
+    """
+    Calculate similarity score between executive records i and j.
+    Takes the already-normalized field lists built in group_executive_records,
+    with names, titles and addresses pre-sorted by sort_tokens.
     Since executives can be at multiple companies, we prioritize name matching
     and don't require company match (person can be at different companies).
     """
@@ -197,36 +337,32 @@ def calculate_similarity_score(record1: Dict, record2: Dict, name_col: str,
     weights = []
     
     # Name similarity (weight: 0.5) - Most important since we're matching across companies
-    name1 = normalize_string(record1.get(name_col, ""))
-    name2 = normalize_string(record2.get(name_col, ""))
+    name1, name2 = names[i], names[j]
     if name1 and name2:
-        # Use token sort ratio for better name matching (handles "John Smith" vs "Smith, John")
-        name_score = fuzz.token_sort_ratio(name1, name2)
+        # Token-sorted ratio for better name matching (handles "John Smith" vs "Smith, John")
+        name_score = fuzz.ratio(name1, name2, processor=None)
         scores.append(name_score)
         weights.append(0.5)
     
     # Address similarity (weight: 0.25) - Strong indicator of same person
-    address1 = normalize_string(record1.get(address_col, ""))
-    address2 = normalize_string(record2.get(address_col, ""))
+    address1, address2 = addresses[i], addresses[j]
     if address1 and address2:
-        address_score = fuzz.token_sort_ratio(address1, address2)
+        address_score = fuzz.ratio(address1, address2, processor=None)
         scores.append(address_score)
         weights.append(0.25)
     
     # Title similarity (weight: 0.15) - Can help but less important
-    title1 = normalize_string(record1.get(title_col, ""))
-    title2 = normalize_string(record2.get(title_col, ""))
+    title1, title2 = titles[i], titles[j]
     if title1 and title2:
-        title_score = fuzz.token_sort_ratio(title1, title2)
+        title_score = fuzz.ratio(title1, title2, processor=None)
         scores.append(title_score)
         weights.append(0.15)
     
     # Company name similarity (weight: 0.1) - Least important since person can be at multiple companies
     # But if companies match, it's a bonus signal
-    company1 = normalize_string(record1.get(company_col, ""))
-    company2 = normalize_string(record2.get(company_col, ""))
+    company1, company2 = companies[i], companies[j]
     if company1 and company2:
-        company_score = fuzz.ratio(company1, company2)
+        company_score = fuzz.ratio(company1, company2, processor=None)
         scores.append(company_score)
         weights.append(0.1)
     
@@ -241,35 +377,140 @@ def calculate_similarity_score(record1: Dict, record2: Dict, name_col: str,
     weighted_score = sum(s * w for s, w in zip(scores, weights)) / total_weight
     return weighted_score
 
+def sort_tokens(values: List[str]) -> List[str]:
+    """Sort the words of each normalized string, so fuzz.ratio on the result equals token_sort_ratio"""
+    return [' '.join(sorted(v.split())) for v in values]
+
+def quick_reject(a: str, b: str, threshold: float) -> bool:
+    """
+    Check whether two strings are too different in length to ever reach threshold.
+    rapidfuzz ratios are bounded by 2 * min(len) / (len(a) + len(b)), so this
+    rules out a pair without running the edit-distance at all.
+    """
+    total_length = len(a) + len(b)
+    if total_length == 0:
+        return False
+    return 200.0 * min(len(a), len(b)) / total_length < threshold
+
+def find_root(parent: List[int], x: int) -> int:
+    """Find the root of x in the union-find forest, compressing the path"""
+    root = x
+    while parent[root] != root:
+        root = parent[root]
+    while parent[x] != root:
+        parent[x], x = root, parent[x]
+    return root
+
+def union_roots(parent: List[int], size: List[int], a: int, b: int):
+    """Merge the sets containing a and b (union by size, so size[root] is the set size)"""
+    root_a = find_root(parent, a)
+    root_b = find_root(parent, b)
+    if root_a == root_b:
+        return
+    if size[root_a] < size[root_b]:
+        root_a, root_b = root_b, root_a
+    parent[root_b] = root_a
+    size[root_a] += size[root_b]
+
+def score_block(indices: List[int], names: np.ndarray, titles: np.ndarray,
+                addresses: np.ndarray, companies: np.ndarray, name_cutoff: float,
+                similarity_threshold: float, workers: int = 1) -> List[Tuple[int, int, float]]:
+    """
+    Score every pair of records in a block with rapidfuzz's cdist and return the
+    (i, j, score) pairs at or above the threshold.
+    Uses the same weights and token-sorted inputs as calculate_similarity_score,
+    held as object arrays so a block's values are gathered with one fancy index;
+    fields that are empty on either side are left out of that pair's weighted average.
+    The block is scored a slice of rows at a time (against the rows from the slice
+    onwards), so memory stays bounded by SCORE_SLICE_CELLS however big the block is.
+    """
+    size = len(indices)
+    
+    fields = []
+    for values, weight, score_cutoff in [
+        (names, 0.5, name_cutoff),
+        (addresses, 0.25, None),
+        (titles, 0.15, None),
+        (companies, 0.1, None),
+    ]:
+        block_values = values[indices]
+        present = block_values != ""
+        if present.sum() >= 2:
+            fields.append((block_values, present, np.float32(weight), score_cutoff))
+    
+    matches = []
+    slice_rows = max(1, SCORE_SLICE_CELLS // size)
+    for start in range(0, size - 1, slice_rows):
+        end = min(start + slice_rows, size)
+        weighted = np.zeros((end - start, size - start), dtype=np.float32)
+        total_weight = np.zeros_like(weighted)
+        
+        for block_values, present, weight, score_cutoff in fields:
+            both_present = np.outer(present[start:end], present[start:])
+            scores = process.cdist(block_values[start:end], block_values[start:], scorer=fuzz.ratio,
+                                   processor=None, score_cutoff=score_cutoff, dtype=np.float32,
+                                   workers=workers)
+            scores *= weight
+            scores *= both_present
+            weighted += scores
+            np.add(total_weight, weight, out=total_weight, where=both_present)
+        
+        np.divide(weighted, total_weight, out=weighted, where=total_weight > 0)
+        # Row r of the slice is record start + r, and so is column r, so k=1
+        # keeps each pair once (j > i)
+        rows, cols = np.nonzero(np.triu(weighted >= similarity_threshold, k=1))
+        matches.extend((indices[start + r], indices[start + c], float(weighted[r, c]))
+                       for r, c in zip(rows.tolist(), cols.tolist()))
+    
+    return matches
+
+def column_tokens(column) -> frozenset:
+    """Split a column name into lowercase word tokens (company_name -> {company, name})"""
+    return frozenset(COLUMN_TOKEN_RE.findall(str(column).lower()))
+
+COLUMN_VARIATION_TOKENS = tuple(
+    [column_tokens(var) for var in variations] for variations in COLUMN_VARIATIONS
+)
+
+def column_match_score(column, bucket: int) -> float:
+    """How well a column name fits one bucket of variations (0 = no match)"""
+    tokens = column_tokens(column)
+    best = 0.0
+    for var_tokens in COLUMN_VARIATION_TOKENS[bucket]:
+        shared = len(tokens & var_tokens)
+        if shared:
+            best = max(best, shared / len(tokens | var_tokens))
+    if not best:
+        # Fall back to the old substring check (e.g. "executivename") at a low score
+        col_lower = str(column).lower()
+        if any(var in col_lower for var in COLUMN_VARIATIONS[bucket]):
+            best = 0.1
+    return best
+
+@lru_cache(maxsize=32)
+def match_column_names(columns: Tuple) -> Tuple:
+    """Assign columns to (name, title, address, company), best-scoring match first"""
+    candidates = []
+    for position, col in enumerate(columns):
+        for bucket in range(len(COLUMN_VARIATIONS)):
+            score = column_match_score(col, bucket)
+            if score:
+                candidates.append((-score, position, bucket, col))
+    
+    # Highest score wins; ties go to the earlier column. Each column fills at
+    # most one bucket, so "company_name" is not also taken as the name column.
+    matched = [None] * len(COLUMN_VARIATIONS)
+    used_positions = set()
+    for _, position, bucket, col in sorted(candidates, key=lambda c: c[:3]):
+        if matched[bucket] is None and position not in used_positions:
+            matched[bucket] = col
+            used_positions.add(position)
+    
+    return tuple(matched)
+
 def identify_column_names(df):
     """Identify column names for name, title, address, company"""
-    name_col = None
-    title_col = None
-    address_col = None
-    company_col = None
-    
-    # Common variations of column names
-    name_variations = ['name', 'executive_name', 'person_name', 'full_name', 
-                       'first_name', 'last_name', 'exec_name']
-    title_variations = ['title', 'job_title', 'position', 'role', 'job', 'exec_title']
-    address_variations = ['address', 'location', 'city', 'state', 'address_line', 
-                         'street', 'mailing_address']
-    company_variations = ['company', 'company_name', 'employer', 'firm', 
-                         'organization', 'org', 'company_name']
-    
-    for col in df.columns:
-        col_lower = str(col).lower()
-        
-        if not name_col and any(var in col_lower for var in name_variations):
-            name_col = col
-        if not title_col and any(var in col_lower for var in title_variations):
-            title_col = col
-        if not address_col and any(var in col_lower for var in address_variations):
-            address_col = col
-        if not company_col and any(var in col_lower for var in company_variations):
-            company_col = col
-    
-    return name_col, title_col, address_col, company_col
+    return match_column_names(tuple(df.columns))
 
 def group_executive_records(df, name_col: str, title_col: str, 
                            address_col: str, company_col: str,
@@ -292,89 +533,172 @@ def group_executive_records(df, name_col: str, title_col: str,
     print("\nNOTE: Grouping by PERSON (not person+company)")
     print("      Executives at multiple companies will be grouped together")
     
-    # Convert dataframe to list of dicts for easier processing
-    records = df.to_dict('records')
+    # Normalize each field once, straight from the columns (no per-row dicts).
+    # Matching uses accent-folded values; the group's person name and company
+    # list keep the original spelling.
+    names = normalize_column(df[name_col])
+    companies = normalize_column(df[company_col])
+    match_names = normalize_column(df[name_col], fold_accents=True)
+    titles = normalize_column(df[title_col], fold_accents=True)
+    addresses = normalize_column(df[address_col], fold_accents=True)
+    match_companies = normalize_column(df[company_col], fold_accents=True)
+    
+    # Token-sorted copies for scoring: sorting each string once here turns
+    # every token_sort_ratio comparison into a plain ratio on the sorted forms
+    name_keys = sort_tokens(match_names)
+    title_keys = sort_tokens(titles)
+    address_keys = sort_tokens(addresses)
+    
+    # Exact duplicates (same normalized name, title, address and company) score
+    # 100 against each other, so only the first copy is scored and the other
+    # copies join its group afterwards
+    first_copy = {}
+    duplicate_of = {}
+    for i, key in enumerate(zip(match_names, titles, addresses, match_companies)):
+        if not key[0]:
+            continue
+        if key in first_copy:
+            duplicate_of[i] = first_copy[key]
+        else:
+            first_copy[key] = i
+    extra_copies = Counter(duplicate_of.values())
+    print(f"Exact duplicates set aside before fuzzy matching: {len(duplicate_of)}")
+    
+    # Bucket records by last name so we only compare plausible matches
+    blocks = build_blocks(["" if i in duplicate_of else name for i, name in enumerate(match_names)])
+    print(f"Blocks: {len(blocks)} "
+          f"(largest: {max((len(b) for b in blocks.values()), default=0)} records)")
+    
+    # Name carries half the weight, so a name score below this can't reach the
+    # threshold even if every other field matches perfectly
+    name_cutoff = max(0.0, 2 * similarity_threshold - 100)
+    
+    # Score each block as a matrix and union every pair above the threshold.
+    # Union-find makes grouping transitive (A~B and B~C puts A, B, C together)
+    # and independent of record order. The score of every matched pair is kept
+    # so the group confidence below doesn't need a second scoring pass.
+    parent = list(range(len(df)))
+    size = [1] * len(df)
+    pair_scores = {}
+    matrix_blocks = []
+    for block in blocks.values():
+        if len(block) < 2:
+            continue
+        if len(block) == 2:
+            # A single pair is cheaper to score directly than as a 2x2 matrix
+            i, j = block
+            if quick_reject(match_names[i], match_names[j], name_cutoff):
+                continue
+            score = calculate_similarity_score(i, j, name_keys, title_keys, address_keys, match_companies)
+            if score >= similarity_threshold:
+                pair_scores[(i, j)] = score
+                union_roots(parent, size, i, j)
+            continue
+        matrix_blocks.append(block)
+    
+    # Small and medium blocks are independent and cdist releases the GIL, so they
+    # are scored on a thread pool with one rapidfuzz thread each (no pickling of
+    # the field arrays like a process pool would need). Large blocks are scored
+    # afterwards one at a time with all of rapidfuzz's threads, so only one of
+    # them is held in memory at once and the CPU isn't oversubscribed.
+    field_arrays = [np.array(values, dtype=object)
+                    for values in (name_keys, title_keys, address_keys, match_companies)]
+    large_blocks = [block for block in matrix_blocks if len(block) >= LARGE_BLOCK_SIZE]
+    pool_blocks = [block for block in matrix_blocks if len(block) < LARGE_BLOCK_SIZE]
+    with ThreadPoolExecutor() as executor:
+        block_matches = executor.map(
+            lambda block: score_block(block, *field_arrays, name_cutoff, similarity_threshold),
+            pool_blocks
+        )
+        for matches in block_matches:
+            for i, j, score in matches:
+                pair_scores[(i, j)] = score
+                union_roots(parent, size, i, j)
+    
+    for block in large_blocks:
+        for i, j, score in score_block(block, *field_arrays, name_cutoff,
+                                       similarity_threshold, workers=-1):
+            pair_scores[(i, j)] = score
+            union_roots(parent, size, i, j)
+    
+    # Re-attach the exact duplicates to their first copy
+    for duplicate, original in duplicate_of.items():
+        union_roots(parent, size, duplicate, original)
+    
+    # Collect the multi-record components (members stay in record order);
+    # singletons are skipped without building anything for them
+    components = defaultdict(list)
+    for i in range(len(df)):
+        root = find_root(parent, i)
+        if size[root] > 1:
+            components[root].append(i)
     
-    # Track which records have been grouped
-    grouped = set()
     groups = []
+    group_roots = []
     group_id = 0
     
-    # For each ungrouped record, find similar records (same person, any company)
-    for i, record1 in enumerate(records):
-        if i in grouped:
-            continue
+    for root, current_group in components.items():
+        # Get all unique companies for this person
+        group_companies = set()
+        for idx in current_group:
+            if companies[idx]:
+                group_companies.add(companies[idx])
         
-        # Start a new group with this record
-        current_group = [i]
-        grouped.add(i)
-        
-        # Find similar records (same person, potentially different companies)
-        for j, record2 in enumerate(records):
-            if j <= i or j in grouped:
-                continue
-            
-            similarity = calculate_similarity_score(
-                record1, record2, name_col, title_col, address_col, company_col
-            )
-            
-            # If similarity is above threshold, add to group (even if different companies)
-            if similarity >= similarity_threshold:
-                current_group.append(j)
-                grouped.add(j)
-        
-        # Only create group if it has multiple records
-        if len(current_group) > 1:
-            # Get all unique companies for this person
-            companies = set()
-            for idx in current_group:
-                company = normalize_string(records[idx].get(company_col, ""))
-                if company:
-                    companies.add(company)
-            
-            groups.append({
-                'group_id': group_id,
-                'record_indices': current_group,
-                'records': [records[idx] for idx in current_group],
-                'companies': list(companies),
-                'person_name': normalize_string(records[current_group[0]].get(name_col, ""))
-            })
-            group_id += 1
+        groups.append({
+            'group_id': group_id,
+            'record_indices': current_group,
+            'companies': list(group_companies),
+            'person_name': names[current_group[0]]
+        })
+        group_roots.append(root)
+        group_id += 1
+    
+    # Only rows that ended up in a group are turned into dicts, in one pass.
+    # Filled-cell counts (not NULL, not empty/zero) are taken on the same rows
+    # so the upload step can pick each group's most complete record.
+    grouped_df = df.iloc[[idx for g in groups for idx in g['record_indices']]]
+    filled_counts = (grouped_df.notna() & ~grouped_df.isin(["", 0])).sum(axis=1).to_numpy()
+    grouped_rows = iter(grouped_df.to_dict('records'))
+    start = 0
+    for group in groups:
+        end = start + len(group['record_indices'])
+        group['records'] = [next(grouped_rows) for _ in group['record_indices']]
+        group['filled_counts'] = filled_counts[start:end]
+        start = end
     
     print(f"Found {len(groups)} groups with multiple records")
     print(f"  (These represent {sum(len(g['records']) for g in groups)} records grouped by person)")
     
-    # Identify uncertain groups (those that need review)
+    # Bucket the matched pair scores by the group they ended up in. A pair of
+    # originals stands for every pairing of their copies, and copies of the
+    # same record match each other at 100.
+    score_totals = defaultdict(float)
+    pair_counts = defaultdict(int)
+    for (i, j), score in pair_scores.items():
+        pairings = (1 + extra_copies[i]) * (1 + extra_copies[j])
+        root = find_root(parent, i)
+        score_totals[root] += score * pairings
+        pair_counts[root] += pairings
+    for original, extra in extra_copies.items():
+        pairings = (extra + 1) * extra // 2
+        root = find_root(parent, original)
+        score_totals[root] += 100.0 * pairings
+        pair_counts[root] += pairings
+    
+    # Identify uncertain groups (those that need review). Every group has at
+    # least one matched pair, and every matched pair scores at or above
+    # similarity_threshold, so the average is never below it: groups are
+    # either 'uncertain' or 'high', never 'low'.
     uncertain_groups = []
-    for group in groups:
-        if len(group['records']) < 2:
-            continue
-        
-        # Calculate average similarity within group
-        similarities = []
-        records_in_group = group['records']
-        
-        for i in range(len(records_in_group)):
-            for j in range(i + 1, len(records_in_group)):
-                sim = calculate_similarity_score(
-                    records_in_group[i], records_in_group[j],
-                    name_col, title_col, address_col, company_col
-                )
-                similarities.append(sim)
-        
-        if similarities:
-            avg_similarity = sum(similarities) / len(similarities)
-            # If average similarity is between thresholds, it's uncertain
-            if similarity_threshold <= avg_similarity < uncertainty_threshold:
-                uncertain_groups.append(group['group_id'])
-                group['avg_similarity'] = avg_similarity
-                group['confidence'] = 'uncertain'
-            elif avg_similarity >= uncertainty_threshold:
-                group['avg_similarity'] = avg_similarity
-                group['confidence'] = 'high'
-            else:
-                group['avg_similarity'] = avg_similarity
-                group['confidence'] = 'low'
+    for group, root in zip(groups, group_roots):
+        # Average similarity of the matched pairs that formed this group
+        avg_similarity = score_totals[root] / pair_counts[root]
+        group['avg_similarity'] = avg_similarity
+        if avg_similarity < uncertainty_threshold:
+            uncertain_groups.append(group['group_id'])
+            group['confidence'] = 'uncertain'
+        else:
+            group['confidence'] = 'high'
     
     print(f"Uncertain groups requiring review: {len(uncertain_groups)}")
     print(f"High confidence groups (auto-approved): {len([g for g in groups if g.get('confidence') == 'high'])}")
@@ -425,8 +749,8 @@ def export_review_data(groups: List[Dict], uncertain_groups: List[int],
             
             export_data["groups"].append(group_data)
         
-        with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, indent=2, ensure_ascii=False)
+        with open(json_filename, 'wb') as f:
+            f.write(orjson.dumps(export_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY))
         
         return json_filename, export_data
         
@@ -510,6 +834,10 @@ def display_review_interface(groups: List[Dict], uncertain_groups: List[int],
     
     return approved_groups, rejected_groups
 
+def is_valid_key(key: str) -> bool:
+    """Check that a key is non-empty and safe to use as one segment of a Firebase path"""
+    return bool(key) and not INVALID_KEY_RE.search(key)
+
 def upload_approved_groups_to_firebase(ref, groups: List[Dict], approved_groups: List[int],
                                        name_col: str, title_col: str, address_col: str, company_col: str):
     """
@@ -523,8 +851,9 @@ def upload_approved_groups_to_firebase(ref, groups: List[Dict], approved_groups:
     print("=" * 80)
     
     try:
-        executives_ref = ref.child('executives')
-        person_companies_ref = ref.child('person_companies')  # For contribution attribution
+        # Every write is queued as a path -> value entry and sent as one
+        # multi-path update per batch instead of one request per record
+        pending_updates = {}
         
         success_count = 0
         
@@ -537,7 +866,7 @@ def upload_approved_groups_to_firebase(ref, groups: List[Dict], approved_groups:
             companies = group.get('companies', [])
             
             # Use the most complete record as the base
-            best_record = max(records, key=lambda r: sum(1 for v in r.values() if v and not pd.isna(v)))
+            best_record = records[int(np.argmax(group['filled_counts']))]
             
             # Get person name (normalized)
             person_name = normalize_string(best_record.get(name_col, ""))
@@ -571,26 +900,41 @@ def upload_approved_groups_to_firebase(ref, groups: List[Dict], approved_groups:
                 }
                 consolidated['all_variations'].append(variation)
             
-            # Upload person record to Firebase (keyed by normalized name)
+            # Upload person record to Firebase (keyed by normalized name).
+            # Keys go straight into multi-path update paths, so an empty or
+            # invalid key would write over the parent node; skip those.
             name_key = person_name.replace(' ', '_').replace(',', '').replace('.', '')
-            executives_ref.child(name_key).set(consolidated)
+            if not is_valid_key(name_key):
+                print(f"  [SKIPPED] Invalid Firebase key for person: {person_name_display!r}")
+                continue
+            pending_updates[f"executives/{name_key}"] = consolidated
             
             # Create company-person links for contribution attribution
             # This allows contributions from this person to count towards all their companies
             for company in companies:
                 company_key = normalize_string(company).replace(' ', '_').replace(',', '').replace('.', '')
+                if not is_valid_key(company_key):
+                    print(f"  [SKIPPED] Invalid Firebase key for company: {company!r}")
+                    continue
                 # Store under /person_companies/[company]/[person_name] = true
-                person_companies_ref.child(company_key).child(name_key).set({
+                pending_updates[f"person_companies/{company_key}/{name_key}"] = {
                     'person_name': person_name_display,
                     'linked_at': datetime.now().isoformat()
-                })
+                }
+            
+            if len(pending_updates) >= FIREBASE_BATCH_SIZE:
+                ref.update(pending_updates)
+                pending_updates = {}
             
             success_count += 1
             if len(companies) > 1:
-                print(f"  [SUCCESS] Uploaded person: {person_name_display}")
-                print(f"            Linked to {len(companies)} companies: {', '.join(companies[:3])}{'...' if len(companies) > 3 else ''}")
+                print(f"  [OK] Prepared person: {person_name_display}")
+                print(f"       Linked to {len(companies)} companies: {', '.join(companies[:3])}{'...' if len(companies) > 3 else ''}")
             else:
-                print(f"  [SUCCESS] Uploaded person: {person_name_display} at {companies[0] if companies else 'N/A'}")
+                print(f"  [OK] Prepared person: {person_name_display} at {companies[0] if companies else 'N/A'}")
+        
+        if pending_updates:
+            ref.update(pending_updates)
         
         print(f"\nSUCCESS: Uploaded {success_count} approved person groups to Firebase")
         print(f"         Person records stored at: /executives/[person_name]")
@@ -604,6 +948,13 @@ def upload_approved_groups_to_firebase(ref, groups: List[Dict], approved_groups:
         traceback.print_exc()
         return False
 
+def open_in_default_app(file_path):
+    """Open a file in the platform's default application without going through a shell"""
+    if not FILE_OPENER:
+        return False
+    subprocess.Popen(FILE_OPENER + [file_path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return True
+
 def main():
     """Main function to run the executive review tool"""
     print("EXECUTIVE RECORD REVIEW TOOL")
@@ -665,14 +1016,7 @@ def main():
             
             # Try to open the file automatically
             try:
-                import platform
-                system = platform.system()
-                if system == 'Darwin':  # macOS
-                    os.system(f'open "{os.path.abspath(json_filename)}"')
-                elif system == 'Windows':
-                    os.system(f'start "" "{os.path.abspath(json_filename)}"')
-                elif system == 'Linux':
-                    os.system(f'xdg-open "{os.path.abspath(json_filename)}"')
+                open_in_default_app(os.path.abspath(json_filename))
             except Exception as e:
                 pass
         
@@ -5,19 +5,74 @@ Professional data pipeline for transferring issues data from Index Align databas
 """
 
 import os
+import argparse
+import platform
+import subprocess
 import pymysql
 import pandas as pd
+import numpy as np
 from sshtunnel import SSHTunnelForwarder
 from firebase_admin import credentials, initialize_app, db
 import firebase_admin
+import requests
+from requests.adapters import HTTPAdapter
+from google.auth.transport.requests import AuthorizedSession
 from dotenv import load_dotenv
 from datetime import datetime
 import json
+import orjson
+import time
+import threading
 from typing import Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import defaultdict
 
 # Load environment variables
 load_dotenv()
 
+# Local copy of the /tickers mapping, reused while the database and its
+# /tickers_version are unchanged (kept next to this script, not in the cwd)
+TICKER_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'tickers.json')
+
+# One SSH tunnel per process, shared by every database connection
+SSH_TUNNEL = None
+SSH_TUNNEL_LOCK = threading.Lock()
+
+# Position labels in the column order used for the argmax in export_data_to_json
+POSITION_LABELS = np.array(['AGAINST', 'PRO', 'NEUTRAL'])
+
+# Accepted column names (lowercase) for each column the issues transform needs
+ISSUE_COLUMN_CANDIDATES = {
+    'ticker': ['ticker', 'company_ticker', 'symbol'],
+    'issue name': ['issue_name', 'issue', 'name'],
+    'Against': ['against', 'against_amount', 'against_value'],
+    'Neutral': ['neutral', 'neutral_amount', 'neutral_value'],
+    'Pro': ['pro', 'pro_amount', 'pro_value', 'for', 'for_amount'],
+}
+
+# Command that opens a file in its default application (None on other platforms)
+FILE_OPENER = {
+    'Darwin': ['open'],
+    'Windows': ['cmd', '/c', 'start', ''],
+    'Linux': ['xdg-open'],
+}.get(platform.system())
+
+# Rows fetched per round-trip when streaming the issues table
+FETCH_CHUNK_SIZE = 10_000
+
+# Concurrent Firebase writes (returns diminish past ~40)
+FIREBASE_UPLOAD_WORKERS = 20
+
+# Companies per multi-path update (keeps each request well under the 16 MB write limit)
+FIREBASE_BATCH_SIZE = 400
+
+# Attempts per write for transient Firebase errors, with exponential backoff between them
+FIREBASE_MAX_ATTEMPTS = 3
+FIREBASE_RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Seconds to wait for one Realtime Database REST request
+FIREBASE_REQUEST_TIMEOUT = 120
+
 def setup_firebase_realtime():
     """Connect to Firebase Realtime Database"""
     try:
@@ -51,7 +106,9 @@ def setup_firebase_realtime():
         return None
 
 def connect_to_index_align_db():
-    """Connect to Index Align database via SSH tunnel"""
+    """Connect to Index Align database via SSH tunnel (reusing the open tunnel if there is one)"""
+    global SSH_TUNNEL
+    
     try:
         # SSH tunnel configuration
         ssh_host = os.getenv('INDEX_ALIGN_SSH_HOST')
@@ -64,34 +121,40 @@ def connect_to_index_align_db():
         db_user = os.getenv('INDEX_ALIGN_DB_USER')
         db_password = os.getenv('INDEX_ALIGN_DB_PASSWORD')
         
-        print(f"Setting up SSH tunnel to {ssh_host}...")
-        
-        # Create SSH tunnel
-        ssh_key_path = os.getenv('INDEX_ALIGN_SSH_KEY_PATH')
-        
-        if ssh_key_path and os.path.exists(ssh_key_path):
-            # Read SSH key using context manager to ensure file is properly closed
-            with open(ssh_key_path, 'r') as key_file:
-                ssh_key = key_file.read()
-            tunnel = SSHTunnelForwarder(
-                (ssh_host, ssh_port),
-                ssh_username=ssh_user,
-                ssh_pkey=ssh_key,
-                remote_bind_address=(db_host, db_port),
-                local_bind_address=('127.0.0.1', 0)
-            )
-        else:
-            # Use password authentication
-            tunnel = SSHTunnelForwarder(
-                (ssh_host, ssh_port),
-                ssh_username=ssh_user,
-                ssh_password=os.getenv('INDEX_ALIGN_SSH_PASSWORD'),
-                remote_bind_address=(db_host, db_port),
-                local_bind_address=('127.0.0.1', 0)
-            )
-        
-        tunnel.start()
-        print(f"SUCCESS: SSH tunnel established (local port: {tunnel.local_bind_port})")
+        with SSH_TUNNEL_LOCK:
+            if SSH_TUNNEL is not None and SSH_TUNNEL.is_active:
+                tunnel = SSH_TUNNEL
+                print(f"SUCCESS: Reusing SSH tunnel (local port: {tunnel.local_bind_port})")
+            else:
+                print(f"Setting up SSH tunnel to {ssh_host}...")
+                
+                # Create SSH tunnel
+                ssh_key_path = os.getenv('INDEX_ALIGN_SSH_KEY_PATH')
+                
+                if ssh_key_path and os.path.exists(ssh_key_path):
+                    # Read SSH key using context manager to ensure file is properly closed
+                    with open(ssh_key_path, 'r') as key_file:
+                        ssh_key = key_file.read()
+                    tunnel = SSHTunnelForwarder(
+                        (ssh_host, ssh_port),
+                        ssh_username=ssh_user,
+                        ssh_pkey=ssh_key,
+                        remote_bind_address=(db_host, db_port),
+                        local_bind_address=('127.0.0.1', 0)
+                    )
+                else:
+                    # Use password authentication
+                    tunnel = SSHTunnelForwarder(
+                        (ssh_host, ssh_port),
+                        ssh_username=ssh_user,
+                        ssh_password=os.getenv('INDEX_ALIGN_SSH_PASSWORD'),
+                        remote_bind_address=(db_host, db_port),
+                        local_bind_address=('127.0.0.1', 0)
+                    )
+                
+                tunnel.start()
+                SSH_TUNNEL = tunnel
+                print(f"SUCCESS: SSH tunnel established (local port: {tunnel.local_bind_port})")
         
         # Connect to MySQL through tunnel
         conn = pymysql.connect(
@@ -127,6 +190,27 @@ def get_issues_table_structure(conn):
         print(f"ERROR: Failed to get table structure: {str(e)}")
         return None
 
+def identify_issue_columns(columns):
+    """Identify the ticker, issue name, Against, Neutral and Pro columns (None if not found)"""
+    # Case-insensitive lookup: lowercase name -> actual column name
+    col_map = {str(col).lower(): col for col in columns}
+    return tuple(
+        next((col_map[name] for name in candidates if name in col_map), None)
+        for candidates in ISSUE_COLUMN_CANDIDATES.values()
+    )
+
+def missing_issue_columns(found_columns):
+    """Names of the roles (ticker, issue name, ...) that identify_issue_columns couldn't find"""
+    return [role for role, col in zip(ISSUE_COLUMN_CANDIDATES, found_columns) if col is None]
+
+def to_float_array(values):
+    """Convert one column of MySQL values to float64 (NULL and unparseable values become NaN)"""
+    try:
+        # Fast path: floats, Decimals, ints, NULLs and numeric strings
+        return np.array(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        return pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+
 def get_issues_from_database(conn):
     """Retrieve issues data from Index Align database"""
     try:
@@ -135,10 +219,40 @@ def get_issues_from_database(conn):
         if not columns:
             return None
         
-        # Query all issues
-        query = "SELECT * FROM issues"
+        # Only the five columns the transform uses are read
+        needed_columns = identify_issue_columns(columns)
+        missing = missing_issue_columns(needed_columns)
+        if missing:
+            print(f"ERROR: Missing required columns in issues table: {', '.join(missing)}")
+            print(f"Available columns: {columns}")
+            return None
         
-        df = pd.read_sql(query, conn)
+        column_list = ', '.join(f"`{col}`" for col in needed_columns)
+        query = f"SELECT {column_list} FROM issues"
+        
+        # Stream rows with an unbuffered cursor. Ticker and issue name are
+        # collected as plain lists; Against/Neutral/Pro go straight from each
+        # chunk of rows into float64 arrays without an object column in between
+        text_columns = needed_columns[:2]
+        amount_columns = needed_columns[2:]
+        text_values = {col: [] for col in text_columns}
+        amount_chunks = {col: [] for col in amount_columns}
+        with conn.cursor(pymysql.cursors.SSCursor) as cursor:
+            cursor.execute(query)
+            while True:
+                rows = cursor.fetchmany(FETCH_CHUNK_SIZE)
+                if not rows:
+                    break
+                chunk_columns = list(zip(*rows))
+                for col, values in zip(text_columns, chunk_columns[:2]):
+                    text_values[col].extend(values)
+                for col, values in zip(amount_columns, chunk_columns[2:]):
+                    amount_chunks[col].append(to_float_array(values))
+        
+        data = dict(text_values)
+        for col, chunks in amount_chunks.items():
+            data[col] = np.concatenate(chunks) if chunks else np.empty(0)
+        df = pd.DataFrame(data, columns=list(needed_columns))
         print(f"SUCCESS: Retrieved {len(df)} issues from Index Align database")
         
         # Display sample data
@@ -152,20 +266,62 @@ def get_issues_from_database(conn):
         print(f"ERROR: Failed to retrieve issues: {str(e)}")
         return None
 
-def get_company_id_from_ticker(ref, ticker):
-    """Get company_id from ticker using the /tickers mapping in Firebase"""
+def load_cached_ticker_map(database_url, version):
+    """Return the cached ticker mapping if it was saved for this database and /tickers_version, else None"""
     try:
-        ticker_ref = ref.child('tickers').child(ticker)
-        company_id = ticker_ref.get()
-        if company_id:
-            return company_id
-        else:
-            return None
+        with open(TICKER_CACHE_PATH, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        if cache.get('database_url') == database_url and cache.get('version') == version:
+            return cache.get('tickers')
+    except (OSError, ValueError):
+        pass
+    return None
+
+def save_cached_ticker_map(database_url, version, ticker_map):
+    """Save the ticker mapping with the database and /tickers_version it was read at"""
+    os.makedirs(os.path.dirname(TICKER_CACHE_PATH), exist_ok=True)
+    with open(TICKER_CACHE_PATH, 'w', encoding='utf-8') as f:
+        json.dump({'database_url': database_url, 'version': version, 'tickers': ticker_map}, f)
+
+def get_ticker_map(ref):
+    """
+    Fetch the whole /tickers mapping from Firebase in one read (ticker -> company_id).
+    If Firebase has a /tickers_version node, the mapping is cached locally and
+    only downloaded again when that version (or the database) changes.
+    
+    Returns the mapping (None on failure) and the status lines to print. It runs
+    alongside the database read, so it leaves the printing to the caller.
+    """
+    messages = []
+    try:
+        # Part of the cache key, so e.g. staging and prod at the same version
+        # never share a mapping
+        database_url = firebase_admin.get_app().options.get('databaseURL')
+        version = ref.child('tickers_version').get()
+        if version is not None:
+            ticker_map = load_cached_ticker_map(database_url, version)
+            if ticker_map is not None:
+                messages.append(f"SUCCESS: Loaded {len(ticker_map)} ticker mappings from local cache (version {version})")
+                return ticker_map, messages
+        
+        tickers = ref.child('tickers').get() or {}
+        ticker_map = {}
+        for ticker, company_id in tickers.items():
+            if company_id:
+                ticker_map[str(ticker).strip().upper()] = str(company_id)
+        messages.append(f"SUCCESS: Loaded {len(ticker_map)} ticker mappings from Firebase")
+        
+        if version is not None:
+            try:
+                save_cached_ticker_map(database_url, version, ticker_map)
+            except OSError as e:
+                messages.append(f"  WARNING: Could not write ticker cache: {str(e)}")
+        return ticker_map, messages
     except Exception as e:
-        print(f"  ERROR: Failed to lookup company_id for ticker {ticker}: {str(e)}")
-        return None
+        messages.append(f"ERROR: Failed to load /tickers mapping: {str(e)}")
+        return None, messages
 
-def transform_issues_data(df, ref):
+def transform_issues_data(df, ticker_map):
     """Transform issues data for Firebase structure: /issues/[company_id]/[issue_name]/Against, Neutral, Pro"""
     if df is None or df.empty:
         return None
@@ -178,48 +334,13 @@ def transform_issues_data(df, ref):
         df_transformed = df.copy()
         
         # Identify required columns
-        # Look for ticker column (could be ticker, TICKER, company_ticker, etc.)
-        ticker_column = None
-        for possible_ticker in ['ticker', 'TICKER', 'company_ticker', 'COMPANY_TICKER', 'symbol', 'SYMBOL']:
-            if possible_ticker in df_transformed.columns:
-                ticker_column = possible_ticker
-                break
-        
-        if ticker_column is None:
-            print("ERROR: No ticker column found in issues table")
-            print(f"Available columns: {list(df_transformed.columns)}")
-            return None
-        
-        # Look for issue name column
-        issue_name_column = None
-        for possible_name in ['issue_name', 'ISSUE_NAME', 'issue', 'ISSUE', 'name', 'NAME']:
-            if possible_name in df_transformed.columns:
-                issue_name_column = possible_name
-                break
-        
-        if issue_name_column is None:
-            print("ERROR: No issue name column found in issues table")
-            print(f"Available columns: {list(df_transformed.columns)}")
-            return None
-        
-        # Look for Against, Neutral, Pro columns (case insensitive)
-        against_column = None
-        neutral_column = None
-        pro_column = None
-        
-        for col in df_transformed.columns:
-            col_lower = str(col).lower()
-            if col_lower in ['against', 'against_amount', 'against_value']:
-                against_column = col
-            elif col_lower in ['neutral', 'neutral_amount', 'neutral_value']:
-                neutral_column = col
-            elif col_lower in ['pro', 'pro_amount', 'pro_value', 'for', 'for_amount']:
-                pro_column = col
-        
-        if not against_column or not neutral_column or not pro_column:
-            print("ERROR: Missing required columns (Against, Neutral, Pro)")
+        found_columns = identify_issue_columns(df_transformed.columns)
+        missing = missing_issue_columns(found_columns)
+        if missing:
+            print(f"ERROR: Missing required columns in issues table: {', '.join(missing)}")
             print(f"Available columns: {list(df_transformed.columns)}")
             return None
+        ticker_column, issue_name_column, against_column, neutral_column, pro_column = found_columns
         
         print(f"Using columns:")
         print(f"  Ticker: {ticker_column}")
@@ -228,56 +349,56 @@ def transform_issues_data(df, ref):
         print(f"  Neutral: {neutral_column}")
         print(f"  Pro: {pro_column}")
         
-        # Convert numeric columns to float
+        # Convert numeric columns to float (only parse columns that didn't arrive numeric)
         for col in [against_column, neutral_column, pro_column]:
-            df_transformed[col] = pd.to_numeric(df_transformed[col], errors='coerce').fillna(0.0).astype(float)
+            values = df_transformed[col]
+            if not pd.api.types.is_numeric_dtype(values):
+                values = pd.to_numeric(values, errors='coerce')
+            df_transformed[col] = values.fillna(0.0).astype(float)
         
-        # Replace NaN with None for JSON serialization
-        df_transformed = df_transformed.where(pd.notnull(df_transformed), None)
+        # Missing tickers and issue names become empty strings (skipped below);
+        # no other column is touched
+        for col in [ticker_column, issue_name_column]:
+            df_transformed[col] = df_transformed[col].fillna('')
         
-        # Build nested structure: issues[company_id][issue_name] = {Against: float, Neutral: float, Pro: float}
-        issues_dict = {}
-        ticker_to_company_id = {}
+        print("\nMapping tickers to company_ids...")
+        # Normalize and map tickers column-wise (no per-row Python work)
+        tickers = df_transformed[ticker_column]
+        ticker_keys = tickers.astype('string').str.strip().str.upper()
+        company_ids = ticker_keys.map(ticker_map)
+        
+        # Skip rows whose ticker is missing, and report tickers with no mapping once each
+        has_ticker = (ticker_keys.str.len() > 0) & (ticker_keys != 'NAN')
+        unmapped = has_ticker & company_ids.isna()
         skipped_tickers = set()
+        for ticker in ticker_keys[unmapped].unique():
+            print(f"  WARNING: No company_id mapping found for ticker {ticker}, skipping...")
+            skipped_tickers.add(ticker)
+        
+        # Skip rows whose issue name is missing
+        issue_names = df_transformed[issue_name_column].astype('string').str.strip()
+        has_issue = issue_names.str.len() > 0
+        
+        # pandas hands back column-major (Fortran-order) arrays; copy to row-major
+        # so each row unpacked in the loop below is one contiguous read
+        keep = has_ticker & company_ids.notna() & has_issue
+        rows = np.ascontiguousarray(pd.DataFrame({
+            'company_id': company_ids[keep],
+            'issue_name': issue_names[keep],
+            'against': df_transformed.loc[keep, against_column],
+            'neutral': df_transformed.loc[keep, neutral_column],
+            'pro': df_transformed.loc[keep, pro_column]
+        }).to_numpy())
         
-        print("\nMapping tickers to company_ids...")
-        for _, row in df_transformed.iterrows():
-            ticker = str(row[ticker_column]).strip().upper()
-            
-            # Skip if ticker is missing or already failed
-            if pd.isna(row[ticker_column]) or ticker == 'NAN' or ticker == '':
-                continue
-            
-            if ticker in skipped_tickers:
-                continue
-            
-            # Get company_id from Firebase ticker mapping
-            if ticker not in ticker_to_company_id:
-                company_id = get_company_id_from_ticker(ref, ticker)
-                if company_id:
-                    ticker_to_company_id[ticker] = str(company_id)
-                else:
-                    print(f"  WARNING: No company_id mapping found for ticker {ticker}, skipping...")
-                    skipped_tickers.add(ticker)
-                    continue
-            
-            company_id = ticker_to_company_id[ticker]
-            issue_name = str(row[issue_name_column]).strip()
-            
-            # Skip if issue name is missing
-            if pd.isna(row[issue_name_column]) or issue_name == '':
-                continue
-            
-            # Initialize company_id if not exists
-            if company_id not in issues_dict:
-                issues_dict[company_id] = {}
-            
-            # Add issue data
+        # Build nested structure: issues[company_id][issue_name] = {Against: float, Neutral: float, Pro: float}
+        issues_dict = defaultdict(dict)
+        for company_id, issue_name, against, neutral, pro in rows:
             issues_dict[company_id][issue_name] = {
-                'Against': float(row[against_column]) if pd.notna(row[against_column]) else 0.0,
-                'Neutral': float(row[neutral_column]) if pd.notna(row[neutral_column]) else 0.0,
-                'Pro': float(row[pro_column]) if pd.notna(row[pro_column]) else 0.0
+                'Against': float(against),
+                'Neutral': float(neutral),
+                'Pro': float(pro)
             }
+        issues_dict = dict(issues_dict)
         
         print(f"\nSUCCESS: Transformed issues data")
         print(f"  Companies processed: {len(issues_dict)}")
@@ -323,18 +444,35 @@ def export_data_to_json(issues_dict, output_dir="."):
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         json_filename = os.path.join(output_dir, f"issues_review_{timestamp}.json")
         
+        # One pass over the issues collects every value; issues keep their
+        # insertion (database) order
+        value_rows = []
+        for issues in issues_dict.values():
+            for values in issues.values():
+                value_rows.append([values.get('Against', 0.0), values.get('Pro', 0.0), values.get('Neutral', 0.0)])
+        
+        # Position is the largest of Against/Pro/Neutral, computed for every issue
+        # at once. Columns are ordered so argmax's first-max tie-break matches the
+        # old rule (Against wins ties, then Pro, then Neutral).
+        matrix = np.array(value_rows, dtype=float).reshape(-1, 3)
+        totals = matrix[:, 0] + matrix[:, 2] + matrix[:, 1]
+        positions = np.where(totals > 0, POSITION_LABELS[matrix.argmax(axis=1)], 'NEUTRAL').tolist()
+        matrix = matrix.tolist()
+        totals = totals.tolist()
+        
         # Prepare data structure with metadata
         export_data = {
             "export_info": {
                 "timestamp": datetime.now().isoformat(),
                 "total_companies": len(issues_dict),
-                "total_issues": sum(len(issues) for issues in issues_dict.values()),
+                "total_issues": len(value_rows),
                 "firebase_path": "/issues/[company_id]/[issue_name]/Against, Neutral, Pro"
             },
             "companies": {}
         }
         
         # Add all companies with their issues
+        row = 0
         for company_id, issues in issues_dict.items():
             company_data = {
                 "company_id": company_id,
@@ -343,36 +481,22 @@ def export_data_to_json(issues_dict, output_dir="."):
             }
             
             # Add all issues for this company
-            for issue_name, values in sorted(issues.items()):
-                against = values.get('Against', 0.0)
-                neutral = values.get('Neutral', 0.0)
-                pro = values.get('Pro', 0.0)
-                total = against + neutral + pro
-                
-                # Determine position (highest value)
-                if total > 0:
-                    if against >= neutral and against >= pro:
-                        position = "AGAINST"
-                    elif pro >= neutral and pro >= against:
-                        position = "PRO"
-                    else:
-                        position = "NEUTRAL"
-                else:
-                    position = "NEUTRAL"
-                
+            for issue_name in issues:
+                against, pro, neutral = matrix[row]
                 company_data["issues"][issue_name] = {
-                    "Against": float(against),
-                    "Neutral": float(neutral),
-                    "Pro": float(pro),
-                    "Total": float(total),
-                    "Position": position
+                    "Against": against,
+                    "Neutral": neutral,
+                    "Pro": pro,
+                    "Total": totals[row],
+                    "Position": positions[row]
                 }
+                row += 1
             
             export_data["companies"][company_id] = company_data
         
-        # Write to JSON file with pretty formatting
-        with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(export_data, f, indent=2, ensure_ascii=False)
+        # Write to JSON file with pretty formatting (orjson encodes in C, straight to UTF-8 bytes)
+        with open(json_filename, 'wb') as f:
+            f.write(orjson.dumps(export_data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS))
         
         return json_filename, export_data
         
@@ -396,15 +520,20 @@ def display_data_visualization(issues_dict, df_original=None):
     print("\nSUMMARY STATISTICS")
     print("-" * 80)
     total_companies = len(issues_dict)
-    total_issues = sum(len(issues) for issues in issues_dict.values())
+    
+    # Count issues and companies with exactly 8 issues in one pass
+    total_issues = 0
+    companies_with_8_issues = 0
+    for issues in issues_dict.values():
+        total_issues += len(issues)
+        if len(issues) == 8:
+            companies_with_8_issues += 1
     avg_issues_per_company = total_issues / total_companies if total_companies > 0 else 0
     
     print(f"  Total Companies: {total_companies}")
     print(f"  Total Issues: {total_issues}")
     print(f"  Average Issues per Company: {avg_issues_per_company:.2f}")
     
-    # Check for companies with exactly 8 issues
-    companies_with_8_issues = sum(1 for issues in issues_dict.values() if len(issues) == 8)
     companies_without_8_issues = total_companies - companies_with_8_issues
     
     print(f"  Companies with exactly 8 issues: {companies_with_8_issues}")
@@ -459,6 +588,36 @@ def display_data_visualization(issues_dict, df_original=None):
         print("  [ERROR] Failed to export JSON file")
         return None
 
+def create_firebase_session():
+    """
+    Authorized HTTP session for the Realtime Database REST API, sharing the
+    Firebase app's service account. The connection pool is sized to the upload
+    thread pool so every worker keeps its TLS connection alive between requests.
+    """
+    app = firebase_admin.get_app()
+    session = AuthorizedSession(app.credential.get_credential())
+    session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=FIREBASE_UPLOAD_WORKERS))
+    return session
+
+def patch_with_retry(session, url, payload):
+    """Multi-path update (REST PATCH), retrying transient errors with exponential backoff"""
+    body = orjson.dumps(payload)
+    for attempt in range(FIREBASE_MAX_ATTEMPTS):
+        last_attempt = attempt == FIREBASE_MAX_ATTEMPTS - 1
+        try:
+            # print=silent: Firebase doesn't echo the written data back
+            response = session.patch(url, data=body, params={'print': 'silent'},
+                                     headers={'Content-Type': 'application/json'},
+                                     timeout=FIREBASE_REQUEST_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout):
+            if last_attempt:
+                raise
+        else:
+            if response.status_code not in FIREBASE_RETRY_STATUS or last_attempt:
+                response.raise_for_status()
+                return
+        time.sleep(2 ** attempt)
+
 def upload_issues_to_firebase(ref, issues_dict, dry_run=False):
     """Upload issues to Firebase Realtime Database under /issues/[company_id]/[issue_name] path"""
     if dry_run:
@@ -492,28 +651,36 @@ def upload_issues_to_firebase(ref, issues_dict, dry_run=False):
             success_count = 0
             skipped_count = 0
             
-            # Upload each company's issues (overwrites entire company object)
-            for company_id, company_issues in issues_dict.items():
-                try:
-                    # Upload entire company object - this overwrites everything for that company_id
-                    company_ref = issues_ref.child(str(company_id))
-                    company_ref.set(company_issues)
-                    
-                    success_count += 1
-                    issue_count = len(company_issues)
-                    print(f"  [SUCCESS] Uploaded company {company_id}: {issue_count} issues")
-                    
-                except Exception as e:
-                    print(f"  [ERROR] Failed to upload company {company_id}: {str(e)}")
-                    skipped_count += 1
-                    continue
+            # Upload companies in multi-path updates of FIREBASE_BATCH_SIZE. Each
+            # path is a whole company, so this still overwrites the entire company
+            # object. Batches are independent and network-bound, so send them
+            # concurrently over one pooled keep-alive session.
+            session = create_firebase_session()
+            issues_url = f"{firebase_admin.get_app().options.get('databaseURL').rstrip('/')}/issues.json"
+            company_items = [(str(company_id), company_issues) for company_id, company_issues in issues_dict.items()]
+            batches = [dict(company_items[start:start + FIREBASE_BATCH_SIZE])
+                       for start in range(0, len(company_items), FIREBASE_BATCH_SIZE)]
+            
+            with ThreadPoolExecutor(max_workers=FIREBASE_UPLOAD_WORKERS) as pool:
+                futures = {pool.submit(patch_with_retry, session, issues_url, batch): batch for batch in batches}
+                for future in as_completed(futures):
+                    batch = futures[future]
+                    try:
+                        future.result()
+                        success_count += len(batch)
+                        issue_count = sum(len(company_issues) for company_issues in batch.values())
+                        print(f"  [SUCCESS] Uploaded {len(batch)} companies: {issue_count} issues")
+                    except Exception as e:
+                        print(f"  [ERROR] Failed to upload {len(batch)} companies: {str(e)}")
+                        skipped_count += len(batch)
+            session.close()
             
             print(f"\nSUCCESS: Uploaded issues for {success_count} companies")
             if skipped_count > 0:
                 print(f"SKIPPED: {skipped_count} companies failed to upload")
             
-            # Verify upload
-            uploaded_companies = len(issues_ref.get() or {})
+            # Verify upload (shallow read: company keys only, not the issue data)
+            uploaded_companies = len(issues_ref.get(shallow=True) or {})
             print(f"VERIFIED: {uploaded_companies} companies now in Firebase /issues")
             
             return success_count > 0
@@ -524,8 +691,99 @@ def upload_issues_to_firebase(ref, issues_dict, dry_run=False):
             traceback.print_exc()
             return False
 
+def open_in_default_app(file_path):
+    """Open a file in the platform's default application without going through a shell"""
+    if not FILE_OPENER:
+        return False
+    subprocess.Popen(FILE_OPENER + [file_path], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return True
+
+def request_upload_approval(json_filename, open_file=True):
+    """Point the user at the exported review file and ask them to approve the upload"""
+    print("\n" + "=" * 80)
+    print("MANUAL REVIEW REQUIRED")
+    print("=" * 80)
+    json_file_path = os.path.abspath(json_filename)
+    print(f"\nAll data has been exported to:")
+    print(f"  File: {json_file_path}")
+    
+    # Try to open the file automatically (platform-specific), unless
+    # --no-open was given (headless/CI runs)
+    if not open_file:
+        print(f"  (Auto-open skipped: --no-open)")
+    else:
+        try:
+            if open_in_default_app(json_file_path):
+                print(f"  [OK] Opened JSON file in default application")
+        except Exception as e:
+            print(f"  (Could not auto-open file: {str(e)})")
+    
+    print("\nPLEASE REVIEW THE JSON FILE BEFORE PROCEEDING:")
+    print("   1. Review all companies and their issues data in the JSON file")
+    print("   2. Verify the data is correct")
+    print("   3. Check that all companies have exactly 8 issues")
+    print("   4. Verify Against, Neutral, and Pro values are correct")
+    print("   5. Return here and approve when ready")
+    print("\nThis data will be uploaded to Firebase Realtime Database at:")
+    print("  Path: /issues/[company_id]/[issue_name]/Against, Neutral, Pro")
+    print("\n[WARNING] This will OVERWRITE all existing issues data for each company_id")
+    print("\n" + "=" * 80)
+    
+    # Ask for approval with multiple confirmation options
+    approved = False
+    max_attempts = 3
+    
+    for attempt in range(max_attempts):
+        try:
+            user_input = input("\nDo you APPROVE this data for upload to Firebase? (yes/no): ").lower().strip()
+            
+            if user_input in ['yes', 'y', 'approve', 'ok']:
+                approved = True
+                break
+            elif user_input in ['no', 'n', 'cancel', 'abort']:
+                print("\n[CANCELLED] Upload cancelled by user")
+                print("No data was uploaded to Firebase.")
+                return False
+            else:
+                remaining = max_attempts - attempt - 1
+                if remaining > 0:
+                    print(f"\n[WARNING] Invalid input. Please type 'yes' to approve or 'no' to cancel.")
+                    print(f"   ({remaining} attempts remaining)")
+                else:
+                    print("\n[CANCELLED] Maximum attempts reached. Upload cancelled for safety.")
+                    return False
+        except EOFError:
+            print("\n[CANCELLED] Input interrupted. Upload cancelled for safety.")
+            return False
+        except KeyboardInterrupt:
+            print("\n\n[CANCELLED] Upload cancelled by user (Ctrl+C)")
+            return False
+    
+    if not approved:
+        print("\n[CANCELLED] Upload not approved. Exiting without uploading.")
+        return False
+    
+    return True
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Transfer issues data from Index Align to Firebase")
+    parser.add_argument(
+        '--yes',
+        action='store_true',
+        help="Approve the upload up front (no review file, no prompt) for scheduled runs"
+    )
+    parser.add_argument(
+        '--no-open',
+        action='store_true',
+        help="Don't open the review JSON file automatically (headless machines)"
+    )
+    return parser.parse_args()
+
 def main():
     """Main function to run the Index Align to Firebase issues pipeline"""
+    args = parse_args()
+    
     print("INDEX ALIGN TO FIREBASE ISSUES TRANSFER")
     print("=" * 60)
     
@@ -545,96 +803,48 @@ def main():
         if not conn or not tunnel:
             return False
         
-        # Step 3: Get issues data
-        print("\nStep 3: Retrieving issues from Index Align database...")
-        df = get_issues_from_database(conn)
+        # Step 3: Get issues data and the ticker mapping. The two reads are
+        # independent (MySQL over SSH vs. Firebase), so the ticker read runs in
+        # the background while the database read prints its progress; the
+        # ticker status lines are printed once both are done.
+        print("\nStep 3: Retrieving issues from Index Align database and ticker mapping from Firebase...")
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            ticker_future = pool.submit(get_ticker_map, firebase_ref)
+            df = get_issues_from_database(conn)
+            ticker_map, ticker_messages = ticker_future.result()
+        for message in ticker_messages:
+            print(message)
+        
         if df is None or df.empty:
             print("ERROR: No issues retrieved from database")
             return False
+        if ticker_map is None:
+            print("ERROR: Could not load ticker mapping from Firebase")
+            return False
         
         # Step 4: Transform data
         print("\nStep 4: Transforming issues data...")
-        issues_dict = transform_issues_data(df, firebase_ref)
+        issues_dict = transform_issues_data(df, ticker_map)
         if issues_dict is None:
             print("ERROR: Data transformation failed")
             return False
         
-        # Step 5: Display data visualization and export to JSON for manual review
-        print("\nStep 5: Exporting all data to JSON file for manual review...")
-        json_filename = display_data_visualization(issues_dict, df)
-        if not json_filename:
-            print("ERROR: Failed to export data for review")
-            return False
-        
-        # Step 6: Manual approval required before upload
-        print("\n" + "=" * 80)
-        print("MANUAL REVIEW REQUIRED")
-        print("=" * 80)
-        json_file_path = os.path.abspath(json_filename)
-        print(f"\nAll data has been exported to:")
-        print(f"  File: {json_file_path}")
-        
-        # Try to open the file automatically (platform-specific)
-        try:
-            import platform
-            system = platform.system()
-            if system == 'Darwin':  # macOS
-                os.system(f'open "{json_file_path}"')
-                print(f"  [OK] Opened JSON file in default application")
-            elif system == 'Windows':
-                os.system(f'start "" "{json_file_path}"')
-                print(f"  [OK] Opened JSON file in default application")
-            elif system == 'Linux':
-                os.system(f'xdg-open "{json_file_path}"')
-                print(f"  [OK] Opened JSON file in default application")
-        except Exception as e:
-            print(f"  (Could not auto-open file: {str(e)})")
-        
-        print("\nPLEASE REVIEW THE JSON FILE BEFORE PROCEEDING:")
-        print("   1. Review all companies and their issues data in the JSON file")
-        print("   2. Verify the data is correct")
-        print("   3. Check that all companies have exactly 8 issues")
-        print("   4. Verify Against, Neutral, and Pro values are correct")
-        print("   5. Return here and approve when ready")
-        print("\nThis data will be uploaded to Firebase Realtime Database at:")
-        print("  Path: /issues/[company_id]/[issue_name]/Against, Neutral, Pro")
-        print("\n[WARNING] This will OVERWRITE all existing issues data for each company_id")
-        print("\n" + "=" * 80)
-        
-        # Ask for approval with multiple confirmation options
-        approved = False
-        max_attempts = 3
-        
-        for attempt in range(max_attempts):
-            try:
-                user_input = input("\nDo you APPROVE this data for upload to Firebase? (yes/no): ").lower().strip()
-                
-                if user_input in ['yes', 'y', 'approve', 'ok']:
-                    approved = True
-                    break
-                elif user_input in ['no', 'n', 'cancel', 'abort']:
-                    print("\n[CANCELLED] Upload cancelled by user")
-                    print("No data was uploaded to Firebase.")
-                    return False
-                else:
-                    remaining = max_attempts - attempt - 1
-                    if remaining > 0:
-                        print(f"\n[WARNING] Invalid input. Please type 'yes' to approve or 'no' to cancel.")
-                        print(f"   ({remaining} attempts remaining)")
-                    else:
-                        print("\n[CANCELLED] Maximum attempts reached. Upload cancelled for safety.")
-                        return False
-            except EOFError:
-                print("\n[CANCELLED] Input interrupted. Upload cancelled for safety.")
+        if args.yes:
+            # Non-interactive run (e.g. scheduled): upload was approved up front,
+            # so skip writing the review file and the prompt
+            print("\nSteps 5-6: Skipping review export and approval (--yes given)")
+        else:
+            # Step 5: Display data visualization and export to JSON for manual review
+            print("\nStep 5: Exporting all data to JSON file for manual review...")
+            json_filename = display_data_visualization(issues_dict, df)
+            if not json_filename:
+                print("ERROR: Failed to export data for review")
                 return False
-            except KeyboardInterrupt:
-                print("\n\n[CANCELLED] Upload cancelled by user (Ctrl+C)")
+            
+            # Step 6: Manual approval required before upload
+            if not request_upload_approval(json_filename, open_file=not args.no_open):
                 return False
         
-        if not approved:
-            print("\n[CANCELLED] Upload not approved. Exiting without uploading.")
-            return False
-        
         # Step 7: Upload to Firebase (only after approval)
         print("\nStep 7: Uploading approved data to Firebase...")
         print("=" * 80)
@@ -5,114 +5,274 @@ Run this before running the main pipeline
 """
 
 import os
-from dotenv import load_dotenv
+import io
+import sys
+import time
+import atexit
+import argparse
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from dotenv import load_dotenv
+except ImportError:
+    # Without python-dotenv the variables must already be set in the environment
+    load_dotenv = None
 
 # Load environment variables
-load_dotenv()
+if load_dotenv is not None:
+    load_dotenv()
+
+# Variables that must be set before running the pipeline, as (service, variable)
+REQUIRED_VARS = (
+    ('Firebase', 'FIREBASE_PROJECT_ID'),
+    ('Firebase', 'FIREBASE_PRIVATE_KEY_ID'),
+    ('Firebase', 'FIREBASE_PRIVATE_KEY'),
+    ('Firebase', 'FIREBASE_CLIENT_EMAIL'),
+    ('Firebase', 'FIREBASE_CLIENT_ID'),
+    ('Index Align', 'INDEX_ALIGN_SSH_HOST'),
+    ('Index Align', 'INDEX_ALIGN_SSH_USER'),
+    ('Index Align', 'INDEX_ALIGN_DB_NAME'),
+    ('Index Align', 'INDEX_ALIGN_DB_USER'),
+    ('Index Align', 'INDEX_ALIGN_DB_PASSWORD')
+)
+
+# Every variable read by the tests (required plus optional SSH/DB settings)
+ALL_VARS = [var for _, var in REQUIRED_VARS] + [
+    'INDEX_ALIGN_SSH_KEY_PATH',
+    'INDEX_ALIGN_SSH_PASSWORD',
+    'INDEX_ALIGN_SSH_PORT',
+    'INDEX_ALIGN_DB_HOST',
+    'INDEX_ALIGN_DB_PORT'
+]
+
+# Snapshot of the environment taken once at import, so tests don't re-read it
+ENV = {var: os.environ.get(var) for var in ALL_VARS}
+
+# SSH key location, checked once instead of in every test
+SSH_KEY_PATH = ENV['INDEX_ALIGN_SSH_KEY_PATH']
+SSH_KEY_EXISTS = bool(SSH_KEY_PATH and os.path.exists(SSH_KEY_PATH))
+
+# Placeholder shown instead of the value of a set variable
+MASK = '*' * 20
+
+# paramiko connect() timeouts, so an unresponsive host fails the test quickly
+SSH_CONNECT_OPTIONS = {
+    'timeout': 10,
+    'banner_timeout': 10,
+    'auth_timeout': 10
+}
+
+# Test names accepted by --tests, in the order they run
+TEST_NAMES = ['env', 'ssh', 'db', 'firebase']
+
+# SSH clients keyed by (host, port, user), shared by the SSH and database tests and
+# kept open across repeated main() runs in the same process
+SSH_CLIENTS = {}
+SSH_CLIENTS_LOCK = threading.Lock()
+
+# Failed connects by the same key, remembered for the rest of the run so the
+# concurrent database test doesn't retry (and wait out the timeout) again
+SSH_CONNECT_ERRORS = {}
+
+# MySQL connections keyed by (SSH host, DB host, DB port, DB name, DB user), reused
+# across repeated main() runs instead of reconnecting each time
+DB_CONNECTIONS = {}
+DB_CONNECTIONS_LOCK = threading.Lock()
 
 def test_environment_variables():
     """Test if all required environment variables are set"""
-    print("TESTING ENVIRONMENT VARIABLES")
-    print("=" * 50)
-    
-    required_vars = {
-        'Firebase': [
-            'FIREBASE_PROJECT_ID',
-            'FIREBASE_PRIVATE_KEY_ID',
-            'FIREBASE_PRIVATE_KEY',
-            'FIREBASE_CLIENT_EMAIL',
-            'FIREBASE_CLIENT_ID'
-        ],
-        'Index Align': [
-            'INDEX_ALIGN_SSH_HOST',
-            'INDEX_ALIGN_SSH_USER',
-            'INDEX_ALIGN_DB_NAME',
-            'INDEX_ALIGN_DB_USER',
-            'INDEX_ALIGN_DB_PASSWORD'
-        ]
-    }
+    # The report is collected and written in one go rather than line by line
+    out = ["TESTING ENVIRONMENT VARIABLES", "=" * 50]
     
     missing_vars = []
     all_present = True
     
-    for category, vars_list in required_vars.items():
-        print(f"\n{category} Variables:")
-        for var in vars_list:
-            value = os.getenv(var)
-            if value and value.strip() and 'your_' not in value.lower():
-                print(f"  [OK] {var}: {'*' * 20} (set)")
-            else:
-                print(f"  [ERROR] {var}: NOT SET")
-                missing_vars.append(var)
-                all_present = False
+    current_category = None
+    for category, var in REQUIRED_VARS:
+        if category != current_category:
+            out.append(f"\n{category} Variables:")
+            current_category = category
+        
+        value = ENV[var]
+        if value and value.strip() and 'your_' not in value.casefold():
+            out.append(f"  [OK] {var}: {MASK} (set)")
+        else:
+            out.append(f"  [ERROR] {var}: NOT SET")
+            missing_vars.append(var)
+            all_present = False
     
     # Check SSH authentication method
-    print("\nSSH Authentication:")
-    ssh_key_path = os.getenv('INDEX_ALIGN_SSH_KEY_PATH')
-    ssh_password = os.getenv('INDEX_ALIGN_SSH_PASSWORD')
+    out.append("\nSSH Authentication:")
+    ssh_password = ENV['INDEX_ALIGN_SSH_PASSWORD']
     
-    if ssh_key_path and os.path.exists(ssh_key_path):
-        print(f"  [OK] Using SSH key: {ssh_key_path}")
+    if SSH_KEY_EXISTS:
+        out.append(f"  [OK] Using SSH key: {SSH_KEY_PATH}")
     elif ssh_password:
-        print(f"  [OK] Using SSH password")
+        out.append("  [OK] Using SSH password")
     else:
-        print(f"  [ERROR] No SSH authentication method set")
-        print(f"    Set either INDEX_ALIGN_SSH_KEY_PATH or INDEX_ALIGN_SSH_PASSWORD")
+        out.append("  [ERROR] No SSH authentication method set")
+        out.append("    Set either INDEX_ALIGN_SSH_KEY_PATH or INDEX_ALIGN_SSH_PASSWORD")
         all_present = False
     
     if all_present:
-        print("\n[SUCCESS] All required environment variables are set")
+        out.append("\n[SUCCESS] All required environment variables are set")
     else:
-        print(f"\n[ERROR] Missing {len(missing_vars)} environment variables")
-        print("Please update your .env file")
+        out.append(f"\n[ERROR] Missing {len(missing_vars)} environment variables")
+        out.append("Please update your .env file")
     
+    sys.stdout.write('\n'.join(out) + '\n')
     return all_present
 
-def test_ssh_connection():
-    """Test SSH connection to Index Align"""
-    print("\n\nTESTING SSH CONNECTION")
-    print("=" * 50)
+@lru_cache(maxsize=1)
+def get_ssh_pkey():
+    """Load and parse the SSH private key (once per process), or None if it is encrypted"""
+    import paramiko
     
+    # Detects the key type (RSA, Ed25519, ECDSA) from the file contents
     try:
-        import paramiko
-        from sshtunnel import SSHTunnelForwarder
+        return paramiko.PKey.from_path(SSH_KEY_PATH)
+    except (TypeError, paramiko.PasswordRequiredException):
+        # Passphrase-protected key: let connect() load it, falling back to the SSH agent
+        return None
+
+def get_ssh_client():
+    """Return the pooled SSH client for Index Align, connecting on first use"""
+    import paramiko
+    
+    ssh_host = ENV['INDEX_ALIGN_SSH_HOST']
+    ssh_user = ENV['INDEX_ALIGN_SSH_USER']
+    ssh_port = int(ENV['INDEX_ALIGN_SSH_PORT'] or '22')
+    key = (ssh_host, ssh_port, ssh_user)
+    
+    with SSH_CLIENTS_LOCK:
+        ssh = SSH_CLIENTS.get(key)
+        transport = ssh.get_transport() if ssh is not None else None
+        if transport is not None and transport.is_active():
+            return ssh
+        if ssh is not None:
+            ssh.close()
+        if key in SSH_CONNECT_ERRORS:
+            raise SSH_CONNECT_ERRORS[key]
         
-        ssh_host = os.getenv('INDEX_ALIGN_SSH_HOST')
-        ssh_user = os.getenv('INDEX_ALIGN_SSH_USER')
-        ssh_port = int(os.getenv('INDEX_ALIGN_SSH_PORT', '22'))
+        ssh_password = ENV['INDEX_ALIGN_SSH_PASSWORD']
         
         print(f"Connecting to {ssh_host}...")
         
-        ssh_key_path = os.getenv('INDEX_ALIGN_SSH_KEY_PATH')
-        ssh_password = os.getenv('INDEX_ALIGN_SSH_PASSWORD')
-        
-        # Test SSH connection
         ssh = paramiko.SSHClient()
         ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
         
-        if ssh_key_path and os.path.exists(ssh_key_path):
-            ssh.connect(ssh_host, username=ssh_user, port=ssh_port, key_filename=ssh_key_path)
-        elif ssh_password:
-            ssh.connect(ssh_host, username=ssh_user, port=ssh_port, password=ssh_password)
-        else:
-            print("[ERROR] No SSH authentication configured")
-            return False
+        try:
+            if SSH_KEY_EXISTS and get_ssh_pkey() is not None:
+                ssh.connect(ssh_host, username=ssh_user, port=ssh_port, pkey=get_ssh_pkey(), **SSH_CONNECT_OPTIONS)
+            elif SSH_KEY_EXISTS:
+                ssh.connect(ssh_host, username=ssh_user, port=ssh_port, key_filename=SSH_KEY_PATH, **SSH_CONNECT_OPTIONS)
+            elif ssh_password:
+                # Go straight to the password instead of offering every agent and ~/.ssh key first
+                ssh.connect(ssh_host, username=ssh_user, port=ssh_port, password=ssh_password,
+                            allow_agent=False, look_for_keys=False, **SSH_CONNECT_OPTIONS)
+            else:
+                raise ValueError("No SSH authentication configured")
+        except Exception as e:
+            ssh.close()
+            SSH_CONNECT_ERRORS[key] = e
+            raise
+        
+        SSH_CLIENTS[key] = ssh
+        return ssh
+
+def close_ssh_clients():
+    """Close all pooled SSH clients"""
+    with SSH_CLIENTS_LOCK:
+        for ssh in SSH_CLIENTS.values():
+            ssh.close()
+        SSH_CLIENTS.clear()
+
+atexit.register(close_ssh_clients)
+
+def get_db_connection():
+    """Return the pooled MySQL connection, opening it over the SSH client on first use"""
+    import pymysql
+    from pymysql.constants import CLIENT
+    
+    db_host = ENV['INDEX_ALIGN_DB_HOST']
+    db_port = int(ENV['INDEX_ALIGN_DB_PORT'] or '3306')
+    db_name = ENV['INDEX_ALIGN_DB_NAME']
+    db_user = ENV['INDEX_ALIGN_DB_USER']
+    db_password = ENV['INDEX_ALIGN_DB_PASSWORD']
+    key = (ENV['INDEX_ALIGN_SSH_HOST'], db_host, db_port, db_name, db_user)
+    
+    with DB_CONNECTIONS_LOCK:
+        conn = DB_CONNECTIONS.pop(key, None)
+        if conn is not None:
+            try:
+                conn.ping(reconnect=False)
+                DB_CONNECTIONS[key] = conn
+                return conn
+            except Exception:
+                # Stale connection (e.g. its SSH channel was closed), reconnect below
+                pass
+        
+        # Forward a channel over the SSH connection already opened by the SSH test
+        ssh = get_ssh_client()
+        channel = ssh.get_transport().open_channel('direct-tcpip', (db_host, db_port), ('127.0.0.1', 0))
+        print(f"[OK] SSH tunnel established (to {db_host}:{db_port})")
+        
+        # Connect to MySQL over the forwarded channel
+        conn = pymysql.connect(
+            user=db_user,
+            password=db_password,
+            database=db_name,
+            charset='utf8mb4',
+            client_flag=CLIENT.MULTI_STATEMENTS,
+            defer_connect=True
+        )
+        conn.connect(sock=channel)
+        
+        DB_CONNECTIONS[key] = conn
+        return conn
+
+def close_db_connections():
+    """Close all pooled MySQL connections"""
+    with DB_CONNECTIONS_LOCK:
+        for conn in DB_CONNECTIONS.values():
+            if conn.open:
+                conn.close()
+        DB_CONNECTIONS.clear()
+
+# Registered after the SSH clients so connections close before their tunnels
+atexit.register(close_db_connections)
+
+def test_ssh_connection():
+    """Test SSH connection to Index Align"""
+    print("\n\nTESTING SSH CONNECTION")
+    print("=" * 50)
+    
+    try:
+        ssh = get_ssh_client()
+        
+        # Both commands run on a single channel, one line of output each;
+        # pwd only runs if whoami succeeded
+        stdin, stdout, stderr = ssh.exec_command('whoami && pwd')
+        lines = stdout.readlines()
+        exit_status = stdout.channel.recv_exit_status()
+        if exit_status != 0 or len(lines) < 2:
+            error = ''.join(stderr.readlines()).strip()
+            raise RuntimeError(f"'whoami && pwd' failed (exit status {exit_status}): {error or 'no output'}")
         
-        stdin, stdout, stderr = ssh.exec_command('whoami')
-        user = stdout.read().decode().strip()
+        user = lines[0].rstrip()
         print(f"[OK] Successfully connected as: {user}")
         
-        stdin, stdout, stderr = ssh.exec_command('pwd')
-        pwd = stdout.read().decode().strip()
+        pwd = lines[1].rstrip()
         print(f"  Current directory: {pwd}")
         
-        ssh.close()
         print("[SUCCESS] SSH connection test passed")
         return True
         
     except ImportError:
-        print("[ERROR] paramiko or sshtunnel not installed")
-        print("  Run: pip install paramiko sshtunnel")
+        print("[ERROR] paramiko not installed")
+        print("  Run: pip install paramiko")
         return False
     except Exception as e:
         print(f"[ERROR] SSH connection failed: {str(e)}")
@@ -124,56 +284,9 @@ def test_database_connection():
     print("=" * 50)
     
     try:
-        import pymysql
-        from sshtunnel import SSHTunnelForwarder
-        
-        ssh_host = os.getenv('INDEX_ALIGN_SSH_HOST')
-        ssh_user = os.getenv('INDEX_ALIGN_SSH_USER')
-        ssh_port = int(os.getenv('INDEX_ALIGN_SSH_PORT', '22'))
-        db_host = os.getenv('INDEX_ALIGN_DB_HOST')
-        db_port = int(os.getenv('INDEX_ALIGN_DB_PORT', '3306'))
-        db_name = os.getenv('INDEX_ALIGN_DB_NAME')
-        db_user = os.getenv('INDEX_ALIGN_DB_USER')
-        db_password = os.getenv('INDEX_ALIGN_DB_PASSWORD')
-        
-        print(f"Setting up SSH tunnel to {ssh_host}...")
-        
-        ssh_key_path = os.getenv('INDEX_ALIGN_SSH_KEY_PATH')
-        ssh_password = os.getenv('INDEX_ALIGN_SSH_PASSWORD')
+        db_name = ENV['INDEX_ALIGN_DB_NAME']
         
-        # Create SSH tunnel
-        if ssh_key_path and os.path.exists(ssh_key_path):
-            # Read SSH key using context manager to ensure file is properly closed
-            with open(ssh_key_path, 'r') as key_file:
-                ssh_key = key_file.read()
-            tunnel = SSHTunnelForwarder(
-                (ssh_host, ssh_port),
-                ssh_username=ssh_user,
-                ssh_pkey=ssh_key,
-                remote_bind_address=(db_host, db_port),
-                local_bind_address=('127.0.0.1', 0)
-            )
-        else:
-            tunnel = SSHTunnelForwarder(
-                (ssh_host, ssh_port),
-                ssh_username=ssh_user,
-                ssh_password=ssh_password,
-                remote_bind_address=(db_host, db_port),
-                local_bind_address=('127.0.0.1', 0)
-            )
-        
-        tunnel.start()
-        print(f"[OK] SSH tunnel established (local port: {tunnel.local_bind_port})")
-        
-        # Connect to MySQL
-        conn = pymysql.connect(
-            host='127.0.0.1',
-            port=tunnel.local_bind_port,
-            user=db_user,
-            password=db_password,
-            database=db_name,
-            charset='utf8mb4'
-        )
+        conn = get_db_connection()
         print(f"[OK] Connected to database: {db_name}")
         
         # Test query
@@ -186,33 +299,51 @@ def test_database_connection():
         if table_exists:
             print("[OK] Issues table exists")
             
-            # Get row count
-            cursor.execute("SELECT COUNT(*) FROM issues")
+            # Get row count and table structure in one round trip
+            cursor.execute("SELECT COUNT(*) FROM issues; SHOW COLUMNS FROM issues")
             count = cursor.fetchone()[0]
             print(f"  Issues count: {count}")
             
-            # Get table structure
-            cursor.execute("SHOW COLUMNS FROM issues")
+            cursor.nextset()
             columns = cursor.fetchall()
             print(f"  Columns: {len(columns)}")
             for col in columns[:5]:  # Show first 5 columns
                 print(f"    - {col[0]} ({col[1]})")
         
         cursor.close()
-        conn.close()
-        tunnel.stop()
         
         print("[SUCCESS] Database connection test passed")
         return True
         
     except ImportError:
-        print("[ERROR] pymysql not installed")
-        print("  Run: pip install pymysql")
+        print("[ERROR] pymysql or paramiko not installed")
+        print("  Run: pip install pymysql paramiko")
         return False
     except Exception as e:
         print(f"[ERROR] Database connection failed: {str(e)}")
         return False
 
+@lru_cache(maxsize=1)
+def get_firebase_credential():
+    """Build the service account credential from env vars (once per process)"""
+    from firebase_admin import credentials
+    
+    private_key = ENV['FIREBASE_PRIVATE_KEY']
+    if not private_key:
+        raise ValueError("FIREBASE_PRIVATE_KEY environment variable is not set")
+    
+    cred_info = {
+        "type": "service_account",
+        "project_id": ENV['FIREBASE_PROJECT_ID'],
+        "private_key_id": ENV['FIREBASE_PRIVATE_KEY_ID'],
+        "private_key": private_key.replace('\\n', '\n'),
+        "client_email": ENV['FIREBASE_CLIENT_EMAIL'],
+        "client_id": ENV['FIREBASE_CLIENT_ID'],
+        "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+        "token_uri": "https://accounts.google.com/o/oauth2/token"
+    }
+    return credentials.Certificate(cred_info)
+
 def test_firebase_connection():
     """Test Firebase connection"""
     print("\n\nTESTING FIREBASE CONNECTION")
@@ -220,35 +351,23 @@ def test_firebase_connection():
     
     try:
         import firebase_admin
-        from firebase_admin import credentials, initialize_app, db
+        from firebase_admin import initialize_app, db
         
         if not firebase_admin._apps:
-            private_key = os.getenv('FIREBASE_PRIVATE_KEY')
-            if not private_key:
-                raise ValueError("FIREBASE_PRIVATE_KEY environment variable is not set")
-            
-            cred_info = {
-                "type": "service_account",
-                "project_id": os.getenv('FIREBASE_PROJECT_ID'),
-                "private_key_id": os.getenv('FIREBASE_PRIVATE_KEY_ID'),
-                "private_key": private_key.replace('\\n', '\n'),
-                "client_email": os.getenv('FIREBASE_CLIENT_EMAIL'),
-                "client_id": os.getenv('FIREBASE_CLIENT_ID'),
-                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                "token_uri": "https://accounts.google.com/o/oauth2/token"
-            }
-            cred = credentials.Certificate(cred_info)
-            initialize_app(cred, {
-                'databaseURL': f"https://{os.getenv('FIREBASE_PROJECT_ID')}-default-rtdb.firebaseio.com/"
+            initialize_app(get_firebase_credential(), {
+                'databaseURL': f"https://{ENV['FIREBASE_PROJECT_ID']}-default-rtdb.firebaseio.com/"
             })
         
         ref = db.reference()
         print("[OK] Connected to Firebase Realtime Database")
         
-        # Test read
+        # Test write, read back and delete
         test_path = ref.child('test_connection')
-        test_path.set({'timestamp': str(os.path.getmtime(__file__))})
+        test_value = {'timestamp': str(time.time_ns())}
+        test_path.set(test_value)
         data = test_path.get()
+        if data != test_value:
+            raise ValueError(f"Read back {data!r}, expected {test_value!r}")
         print(f"[OK] Read/Write test successful")
         test_path.delete()
         
@@ -263,28 +382,94 @@ def test_firebase_connection():
         print(f"[ERROR] Firebase connection failed: {str(e)}")
         return False
 
+class ThreadBufferedOutput:
+    """Stand-in for sys.stdout that keeps each worker thread's output separate"""
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+    
+    def capture(self, func):
+        """Run func and return its result together with everything it printed"""
+        self.local.buffer = io.StringIO()
+        try:
+            return func(), self.local.buffer.getvalue()
+        finally:
+            self.local.buffer = None
+    
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        return (self.stream if buffer is None else buffer).write(text)
+    
+    def flush(self):
+        self.stream.flush()
+    
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+def run_tests_concurrently(tests):
+    """Run independent tests in parallel, printing each test's output in order"""
+    stdout = sys.stdout
+    output = ThreadBufferedOutput(stdout)
+    results = {}
+    
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+            futures = {name: executor.submit(output.capture, test) for name, test in tests.items()}
+            for name, future in futures.items():
+                results[name], test_output = future.result()
+                stdout.write(test_output)
+                stdout.flush()
+    finally:
+        sys.stdout = stdout
+    
+    return results
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Test Index Align and Firebase connections")
+    parser.add_argument(
+        '--tests',
+        nargs='+',
+        choices=TEST_NAMES,
+        default=TEST_NAMES,
+        help="Tests to run (default: all)"
+    )
+    return parser.parse_args()
+
 def main():
-    """Run all tests"""
+    """Run the selected tests"""
+    args = parse_args()
+    
+    # A new run gets a fresh attempt at any SSH connect that failed last time
+    with SSH_CLIENTS_LOCK:
+        SSH_CONNECT_ERRORS.clear()
+    
     print("INDEX ALIGN TO FIREBASE - CONNECTION TEST")
     print("=" * 60)
     
     results = {}
     
     # Test 1: Environment variables
-    results['env'] = test_environment_variables()
-    
-    if not results['env']:
-        print("\nPlease fix environment variables before proceeding")
-        return
-    
-    # Test 2: SSH connection
-    results['ssh'] = test_ssh_connection()
-    
-    # Test 3: Database connection
-    results['db'] = test_database_connection()
+    if 'env' in args.tests:
+        results['env'] = test_environment_variables()
+        
+        if not results['env']:
+            print("\nPlease fix environment variables before proceeding")
+            return
     
-    # Test 4: Firebase connection
-    results['firebase'] = test_firebase_connection()
+    # Tests 2-4: SSH, database and Firebase connections (I/O bound, run in parallel).
+    # The connection libraries are imported inside each test, so unselected tests
+    # never load them.
+    connection_tests = {
+        'ssh': test_ssh_connection,
+        'db': test_database_connection,
+        'firebase': test_firebase_connection
+    }
+    selected = {name: test for name, test in connection_tests.items() if name in args.tests}
+    if selected:
+        results.update(run_tests_concurrently(selected))
     
     # Summary
     print("\n\nTEST SUMMARY")
@@ -295,7 +480,9 @@ def main():
     
     all_passed = all(results.values())
     
-    if all_passed:
+    if all_passed and len(results) < len(TEST_NAMES):
+        print(f"\n[SUCCESS] All selected tests passed ({', '.join(results)})")
+    elif all_passed:
         print("\n[SUCCESS] All tests passed! You're ready to run the pipeline.")
         print("Run: python index_align_to_firebase.py")
     else: